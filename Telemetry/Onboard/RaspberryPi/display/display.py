@@ -1,43 +1,67 @@
 #!/usr/bin/env python3
 
 import time
-import math
 import json
 import threading
-import os
+import queue
+import mmap
+import struct
+import functools
+import numpy as np
 from datetime import datetime, timezone
 from paho.mqtt import client as mqtt_client
 from luma.core.interface.serial import i2c
 from luma.oled.device import ssd1309
 from PIL import Image, ImageDraw, ImageFont
+try: # Optional: faster JSON decoding of incoming MQTT payloads (pip install orjson)
+    import orjson
+except ImportError:
+    orjson = None
 
 # --- Configuration ---
 MQTT_BROKER = "tome.lu"
 MQTT_PORT = 1883
 MQTT_USER = "eco"
 MQTT_PASSWORD = "marathon"
+MQTT_CLIENT_ID = "oled_display_128x64_v3_wildcard" # Must stay stable for the persistent session
+MQTT_KEEPALIVE_S = 30
 
 # --- MQTT Topics ---
 MQTT_TOPIC_GPS_STATUS = "gps/status"
+MQTT_TOPIC_GPS_TELEMETRY = "gps/telemetry" # Fused position + status, carries status when both are due
 MQTT_TOPIC_RACE_LAPS = "race/laps"
 # We will subscribe to config/# instead of a single topic
 MQTT_CONFIG_BASE_TOPIC = "config" # Base for wildcard subscription
 MQTT_TOPIC_TOTAL_LAPS = f"{MQTT_CONFIG_BASE_TOPIC}/total_laps"
 MQTT_TOPIC_IDEAL_TIME = f"{MQTT_CONFIG_BASE_TOPIC}/ideal_time"
+MQTT_TOPIC_SPEED = "speed/data" # Published by this script: SPEED_PAYLOAD (f32 rpm, f64 unix timestamp)
 # Add other specific config topics if needed, e.g.:
 # MQTT_TOPIC_START_LINE = f"{MQTT_CONFIG_BASE_TOPIC}/start_line"
 
-WHEEL_SPEED_FILE = '/tmp/wheel_speed.json'
+SPEED_SHM_FILE = '/dev/shm/wheel_speed' # Written in place by wheel_speed: little-endian f64 rpm, f64 unix timestamp
+SPEED_RECORD = struct.Struct('<dd')
+SPEED_PAYLOAD = struct.Struct('<fd') # speed/data payload, 12 bytes little-endian
+SPEED_PUBLISH_INTERVAL_S = 0.25 # Check for a speed change to publish at most 4 times per second
+PUBLISH_MIN_RPM_DELTA = 8.0 # Only publish when RPM moves by at least this much (~0.5 km/h)
+HEARTBEAT_S = 5.0 # Republish an unchanged value at least this often so subscribers can tell the sensor is alive
 WHEEL_CIRCUMFERENCE_M = 1.05
+RPM_TO_KMH = WHEEL_CIRCUMFERENCE_M * 3.6 / 60 # rev/min -> m/s -> km/h
 RECONNECT_DELAY_S = 5.0
 STALE_DATA_THRESHOLD_S = 5.0
 STATUS_UPDATE_INTERVAL_S = 5.0
+FRAME_INTERVAL_S = 0.1 # Target frame period (10 Hz), kept on a monotonic deadline
+MESSAGE_QUEUE_SIZE = 64 # Raw MQTT messages waiting for the parser thread; oldest dropped when full
 
 # --- Global State ---
 mqtt_connected = False
-last_reconnect_attempt = 0
-last_status_update_time = 0
-mqtt_loop_running = False
+mqtt_lock = threading.Lock() # Serializes paho calls between the main loop and the reconnect watchdog
+mqtt_connecting = False # Set while the watchdog is inside the blocking connect(); service_mqtt() leaves the client alone meanwhile
+reconnect_stop = threading.Event() # Set on shutdown to end the reconnect watchdog
+last_status_update_time = 0 # time.monotonic()
+mqtt_subscribed = False # Subscriptions made by this process; a resumed broker session still holds them
+message_queue = queue.Queue(maxsize=MESSAGE_QUEUE_SIZE) # (topic, payload bytes, receive time) from the network thread
+last_speed_check_time = 0.0 # time.monotonic() of the last speed/data publish check
+last_published_rpm = None; last_published_time = 0.0 # Last speed/data sample sent, for delta + heartbeat publishing
 
 # Data Stores (Initialize total_laps to distinguish from default 0)
 race_data = {
@@ -51,7 +75,7 @@ race_data = {
     # "start_line": None,
 }
 gps_status_data = { "has_fix": False, "quality": 0, "satellites": 0, "last_update_time": 0 }
-speed_data = { "speed_kmh": 0.0, "timestamp": 0 }
+speed_data = { "rpm": 0.0, "speed_kmh": 0.0, "timestamp": 0 }
 status_flags = { "mqtt_ok": False, "gps_fix_ok": False, "speed_data_ok": False }
 
 # --- Initialize Display & Fonts (Unchanged) ---
@@ -68,15 +92,22 @@ time_info_font = load_font("DejaVuSans.ttf", 10)
 
 # --- Tachometer Drawing Functions (Unchanged) ---
 center_x = 132; center_y = 68; inner_radius = 48; outer_radius = 58
-start_angle = 180; end_angle = 90; max_speed = 50; end_y_offset = 15
+start_angle = 180; end_angle = 90; max_speed = 50
+# cos/sin lookup tables indexed by integer degree (0..360); plain lists so per-frame lookups return Python floats, not numpy scalars
+COS_TABLE = np.cos(np.deg2rad(np.arange(361))).tolist(); SIN_TABLE = np.sin(np.deg2rad(np.arange(361))).tolist()
+SPEED_STRS = tuple(str(i) for i in range(int(max_speed) + 1)) # Digital readout strings for the gauge range
+def speed_text(speed_kmh):
+    speed_int = int(speed_kmh)
+    return SPEED_STRS[speed_int] if 0 <= speed_int <= max_speed else str(speed_int)
 def point_on_arc(radius, angle_deg):
-    angle_rad = math.radians(angle_deg); x = center_x + int(radius * math.cos(angle_rad))
-    y = center_y - int(radius * math.sin(angle_rad))
-    if abs(angle_deg - end_angle) < 1e-6: y += end_y_offset
+    angle_idx = int(round(angle_deg)) % 360; x = center_x + int(radius * COS_TABLE[angle_idx])
+    y = center_y - int(radius * SIN_TABLE[angle_idx])
     return (x, y)
 def draw_arc_outline(draw):
-    for angle_deg in range(int(end_angle), int(start_angle) + 1):
-        try: draw.point(point_on_arc(inner_radius, angle_deg), fill="white"); draw.point(point_on_arc(outer_radius, angle_deg), fill="white")
+    # Pillow measures angles clockwise from 3 o'clock (y down), so gauge angle a maps to 360 - a
+    for radius in (inner_radius, outer_radius):
+        bbox = (center_x - radius, center_y - radius, center_x + radius, center_y + radius)
+        try: draw.arc(bbox, 360 - start_angle, 360 - end_angle, fill="white")
         except Exception as e: pass
 def draw_speed_ticks(draw):
     tick_length = 4; label_offset = 8;
@@ -92,47 +123,99 @@ def draw_needle(draw, angle_deg):
     try: draw.line([point_on_arc(inner_radius, angle_deg), point_on_arc(outer_radius, angle_deg)], fill="white", width=2)
     except Exception as e: pass
 
-# --- Helper Functions (Unchanged) ---
+# --- Static Gauge Background (arc, ticks and labels never change, draw them once) ---
+gauge_background = Image.new('1', (device.width, device.height), 0)
+background_draw = ImageDraw.Draw(gauge_background)
+draw_arc_outline(background_draw); draw_speed_ticks(background_draw)
+del background_draw
+# Persistent frame buffer + draw context, reset from gauge_background each frame instead of reallocating
+image = Image.new('1', (device.width, device.height), 0); draw = ImageDraw.Draw(image)
+
+# --- Pre-rendered Text Sprites (rasterize each string once, paste the bitmap afterwards) ---
+TEXT_SPRITE_CACHE_SIZE = 4096 # Least recently used sprites are evicted: lap timer strings change every second
+@functools.lru_cache(maxsize=TEXT_SPRITE_CACHE_SIZE)
+def text_sprite(text, font, anchor="la"):
+    """Renders text once into (mask image, x offset, y offset from the anchor point), cached per (text, font, anchor)."""
+    left, top, right, bottom = font.getbbox(text, mode="1", anchor=anchor) # mode "1" = same hinting as draw.text on a 1-bit image
+    mask = Image.new('1', (max(right - left, 1), max(bottom - top, 1)), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=1, font=font, anchor=anchor)
+    return (mask, left, top)
+def paste_text(xy, text, font, anchor="la"):
+    """Same pixels as draw.text(xy, text, fill="white", font=font, anchor=anchor) on the frame buffer, without FreeType."""
+    mask, left, top = text_sprite(text, font, anchor)
+    image.paste(255, (xy[0] + left, xy[1] + top), mask)
+for speed_str in SPEED_STRS: text_sprite(speed_str, digital_font, "rb") # Every in-range readout rendered up front
+
+# --- Frame Output (bypasses luma's per-pixel packing in device.display) ---
+def pack_frame(image):
+    """Packs a mode '1' image into SSD1309 GDDRAM order: 8 pages x 128 columns, LSB = top row of the page."""
+    pixels = np.asarray(image, dtype=np.uint8).reshape(device.height // 8, 8, device.width)
+    return np.packbits(pixels, axis=1, bitorder='little').tobytes()
+last_frame_buf = None # Packed bytes of the frame currently on the panel
+def push_frame(image):
+    """Writes the range of pages that changed since the last frame in one data burst (nothing if identical).
+    luma initialises the panel in horizontal addressing mode, so a page window is one contiguous byte range."""
+    global last_frame_buf
+    buf = pack_frame(image)
+    if buf == last_frame_buf: return
+    page_bytes = device.width; num_pages = device.height // 8
+    if last_frame_buf is None: first_page, last_page = 0, num_pages - 1
+    else:
+        changed = [page for page in range(num_pages)
+                   if buf[page * page_bytes:(page + 1) * page_bytes] != last_frame_buf[page * page_bytes:(page + 1) * page_bytes]]
+        first_page, last_page = changed[0], changed[-1]
+    device.command(0x21, 0, device.width - 1, 0x22, first_page, last_page) # Column and page window
+    device.data(list(buf[first_page * page_bytes:(last_page + 1) * page_bytes]))
+    last_frame_buf = buf
+
+# --- Helper Functions ---
+@functools.lru_cache(maxsize=4096)
+def format_whole_seconds(total_seconds): return f"{total_seconds // 60:02d}:{total_seconds % 60:02d}" # Lap timers repeat the same values
 def format_time(seconds):
     if seconds is None: return "--:--"
     try:
         seconds = float(seconds);
         if seconds < 0: return "00:00"
-        minutes = int(seconds // 60); remaining_seconds = round(seconds % 60)
-        if remaining_seconds == 60: minutes += 1; remaining_seconds = 0
-        return f"{minutes:02d}:{remaining_seconds:02d}"
+        return format_whole_seconds(int(seconds // 60) * 60 + round(seconds % 60)) # Rounded to the displayed second
     except (TypeError, ValueError): return "--:--"
 def calculate_speed_kmh(rpm):
     if WHEEL_CIRCUMFERENCE_M <= 0: return 0.0
-    try: speed_mps = (float(rpm) * WHEEL_CIRCUMFERENCE_M) / 60; return speed_mps * 3.6
+    try: return float(rpm) * RPM_TO_KMH
     except (TypeError, ValueError): return 0.0
+speed_shm = None # Read-only mapping of SPEED_SHM_FILE, opened once the producer has created it
+
 def read_speed_data():
-    try:
-        file_mod_time = os.path.getmtime(WHEEL_SPEED_FILE)
-        with open(WHEEL_SPEED_FILE, 'r') as f: data = json.load(f)
-        rpm = data.get('rpm', 0.0); timestamp = data.get('timestamp', file_mod_time)
-        return {'speed_kmh': calculate_speed_kmh(rpm), 'timestamp': float(timestamp)}
-    except FileNotFoundError: return {'speed_kmh': 0.0, 'timestamp': 0}
-    except json.JSONDecodeError: print("Warning: Error decoding speed file JSON."); return {'speed_kmh': 0.0, 'timestamp': 0}
-    except Exception as e: print(f"Warning: Could not read/parse speed file: {e}"); return {'speed_kmh': 0.0, 'timestamp': 0}
+    global speed_shm
+    if speed_shm is None:
+        try:
+            with open(SPEED_SHM_FILE, 'rb') as f: speed_shm = mmap.mmap(f.fileno(), SPEED_RECORD.size, prot=mmap.PROT_READ)
+        except (OSError, ValueError): return {'rpm': 0.0, 'speed_kmh': 0.0, 'timestamp': 0} # Producer not started yet (missing or not sized)
+    rpm, timestamp = SPEED_RECORD.unpack_from(speed_shm)
+    return {'rpm': rpm, 'speed_kmh': calculate_speed_kmh(rpm), 'timestamp': timestamp}
 
 # --- MQTT Callbacks ---
 def on_connect(client, userdata, flags, rc, properties=None):
-    global mqtt_connected, status_flags
+    global mqtt_connected, status_flags, mqtt_subscribed
     if rc == 0:
         print("MQTT: Connected successfully.")
         mqtt_connected = True; status_flags["mqtt_ok"] = True
+        # Resumed session: broker kept our subscriptions and queued QoS 1 messages. After a process restart we still
+        # subscribe, since retained config is only sent in response to a SUBSCRIBE.
+        if flags.session_present and mqtt_subscribed: print("MQTT: Session resumed, keeping existing subscriptions."); return
         try:
             print("MQTT: Subscribing...")
-            # Subscribe to specific topics
-            client.subscribe(MQTT_TOPIC_GPS_STATUS, qos=1)
+            # Subscribe to specific topics. GPS status is latest-value-wins: QoS 0 avoids acks and duplicate redelivery
+            client.subscribe(MQTT_TOPIC_GPS_STATUS, qos=0)
             print(f"MQTT: Subscribed to {MQTT_TOPIC_GPS_STATUS}")
+            client.subscribe(MQTT_TOPIC_GPS_TELEMETRY, qos=0)
+            print(f"MQTT: Subscribed to {MQTT_TOPIC_GPS_TELEMETRY}")
             client.subscribe(MQTT_TOPIC_RACE_LAPS, qos=1)
             print(f"MQTT: Subscribed to {MQTT_TOPIC_RACE_LAPS}")
             # Subscribe to config wildcard - IMPORTANT: Publisher must retain individual config messages
             config_wildcard = f"{MQTT_CONFIG_BASE_TOPIC}/#"
             client.subscribe(config_wildcard, qos=1)
             print(f"MQTT: Subscribed to {config_wildcard}")
+            mqtt_subscribed = True
         except Exception as e:
             print(f"MQTT: Error during subscribe call: {e}")
             mqtt_connected = False; status_flags["mqtt_ok"] = False
@@ -144,26 +227,38 @@ def on_subscribe(client, userdata, mid, granted_qos, properties=None):
     print(f"MQTT: Subscription acknowledged (MID: {mid}). Granted QoS: {granted_qos}")
     # Retained messages for subscribed topics (including config/#) should arrive shortly after this.
 
-def on_disconnect(client, userdata, rc, properties=None):
-    global mqtt_connected, last_reconnect_attempt, status_flags, mqtt_loop_running
-    print(f"MQTT: Disconnected with code: {rc}.")
+def on_disconnect(client, userdata, flags, reason_code, properties=None): # paho VERSION2 callback signature
+    global mqtt_connected, status_flags
+    print(f"MQTT: Disconnected with code: {reason_code}.")
     mqtt_connected = False; status_flags["mqtt_ok"] = False
-    mqtt_loop_running = False; last_reconnect_attempt = 0
 
 def on_message(client, userdata, msg):
+    """Hand the raw message to the parser thread so paho's network loop never waits on JSON/state updates."""
+    item = (msg.topic, msg.payload, time.time())
+    try: message_queue.put_nowait(item)
+    except queue.Full:
+        try: message_queue.get_nowait() # Drop the oldest message to make room
+        except queue.Empty: pass
+        try: message_queue.put_nowait(item)
+        except queue.Full: print(f"Warning: MQTT message queue full, dropped message on {msg.topic}")
+
+def loads_json(payload_bytes):
+    """Decodes a JSON payload with orjson when available (its JSONDecodeError subclasses json.JSONDecodeError)."""
+    return orjson.loads(payload_bytes) if orjson is not None else json.loads(payload_bytes)
+
+def handle_message(topic, payload_bytes, now):
     global race_data, gps_status_data
-    now = time.time()
-    topic = msg.topic
     payload_str = None # Define outside try block
 
     try:
-        payload_str = msg.payload.decode('utf-8')
+        payload_str = payload_bytes.decode('utf-8')
         #print(f"MQTT: Message received on topic '{topic}'. Payload: '{payload_str}' Retained: {msg.retain}")
 
-        # --- Handle GPS Status ---
-        if topic == MQTT_TOPIC_GPS_STATUS:
+        # --- Handle GPS Status (standalone or inside fused telemetry) ---
+        if topic == MQTT_TOPIC_GPS_STATUS or topic == MQTT_TOPIC_GPS_TELEMETRY:
             try:
-                payload = json.loads(payload_str)
+                payload = loads_json(payload_bytes)
+                if topic == MQTT_TOPIC_GPS_TELEMETRY and isinstance(payload, dict): payload = payload.get('status')
                 if isinstance(payload, dict):
                     gps_status_data['has_fix'] = payload.get('has_fix', False)
                     gps_status_data['quality'] = payload.get('fix_quality', 0) # Use key from logs
@@ -175,7 +270,7 @@ def on_message(client, userdata, msg):
         # --- Handle Race Laps ---
         elif topic == MQTT_TOPIC_RACE_LAPS:
             try:
-                payload = json.loads(payload_str)
+                payload = loads_json(payload_bytes)
                 if isinstance(payload, dict):
                     event = payload.get("event")
                     race_data['last_update_time'] = now
@@ -231,30 +326,76 @@ def on_message(client, userdata, msg):
     except UnicodeDecodeError: print(f"Error decoding MQTT payload (not UTF-8?) on {topic}")
     except Exception as e: print(f"Error processing MQTT message on {topic}: {e}")
 
+def message_worker():
+    while True:
+        topic, payload_bytes, received_at = message_queue.get()
+        handle_message(topic, payload_bytes, received_at)
+
 
 # --- MQTT Client Setup ---
-client = mqtt_client.Client(mqtt_client.CallbackAPIVersion.VERSION2, client_id="oled_display_128x64_v3_wildcard")
+client = mqtt_client.Client(mqtt_client.CallbackAPIVersion.VERSION2, client_id=MQTT_CLIENT_ID, clean_session=False) # Persistent session
 client.username_pw_set(MQTT_USER, MQTT_PASSWORD)
 client.on_connect = on_connect; client.on_message = on_message
 client.on_disconnect = on_disconnect; client.on_subscribe = on_subscribe
+threading.Thread(target=message_worker, name="mqtt-message-worker", daemon=True).start()
 
-# --- MQTT Connection Logic (Unchanged) ---
+# --- MQTT Connection Logic ---
+# paho runs on the main thread (no loop_start): service_mqtt() does the network I/O between frames,
+# reconnect_watchdog() opens the connection from its own thread so the frame loop never checks for it
 def attempt_mqtt_connect():
-    global last_reconnect_attempt, mqtt_loop_running
-    now = time.time()
-    if not mqtt_connected and (now - last_reconnect_attempt > RECONNECT_DELAY_S):
-        last_reconnect_attempt = now; print("MQTT: Attempting to connect...")
-        try:
-            client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
-            if not mqtt_loop_running:
-                 try: client.loop_start(); mqtt_loop_running = True; print("MQTT: Network loop started.")
-                 except RuntimeError: mqtt_loop_running = True; pass # Already running is ok
-                 except Exception as e: print(f"MQTT: Error starting loop: {e}"); mqtt_loop_running = False
-        except Exception as e: print(f"MQTT: Connection attempt failed: {e}"); status_flags["mqtt_ok"] = False
+    """Opens the connection without holding mqtt_lock, so DNS/TCP timeouts never stall the frame loop."""
+    global mqtt_connecting
+    with mqtt_lock:
+        if mqtt_connected or client.socket() is not None: return # Connected, or CONNACK still pending
+        mqtt_connecting = True
+    print("MQTT: Attempting to connect...")
+    try: client.connect(MQTT_BROKER, MQTT_PORT, MQTT_KEEPALIVE_S) # CONNACK is handled by a later service_mqtt() call
+    except Exception as e: print(f"MQTT: Connection attempt failed: {e}"); status_flags["mqtt_ok"] = False
+    finally:
+        with mqtt_lock: mqtt_connecting = False
+
+def reconnect_watchdog():
+    """Tries to (re)connect every RECONNECT_DELAY_S while disconnected; dead links are detected by the MQTT keepalive."""
+    while not reconnect_stop.is_set():
+        if not mqtt_connected: attempt_mqtt_connect()
+        reconnect_stop.wait(RECONNECT_DELAY_S)
+
+def service_mqtt(timeout):
+    """Process MQTT traffic for up to `timeout` seconds (at least one non-blocking pass); sleeps instead while there is no socket."""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = max(deadline - time.monotonic(), 0.0)
+        with mqtt_lock: rc = client.loop(timeout=remaining) if not mqtt_connecting and client.socket() is not None else None
+        if rc is None: # No connection yet, or the watchdog is still opening it
+            if remaining > 0: time.sleep(remaining)
+            return
+        remaining = deadline - time.monotonic()
+        if rc != mqtt_client.MQTT_ERR_SUCCESS: # Connection lost; on_disconnect has run, retry on a later frame
+            if remaining > 0: time.sleep(remaining)
+            return
+        if remaining <= 0: return
+
+# --- Speed Publishing (formerly speed/send.py) ---
+def publish_speed(speed_data):
+    """Publishes the wheel RPM on speed/data when it changed by PUBLISH_MIN_RPM_DELTA or the heartbeat is due."""
+    global last_speed_check_time, last_published_rpm, last_published_time
+    now = time.monotonic()
+    if not mqtt_connected or (now - last_speed_check_time) < SPEED_PUBLISH_INTERVAL_S: return
+    last_speed_check_time = now
+    if not speed_data['timestamp']: return # No speed record yet
+    rpm = speed_data['rpm']
+    if last_published_rpm is not None and abs(rpm - last_published_rpm) < PUBLISH_MIN_RPM_DELTA and (now - last_published_time) < HEARTBEAT_S: return
+    try:
+        # Retained so late subscribers get the current value; QoS 0 for high-frequency data
+        result, mid = client.publish(MQTT_TOPIC_SPEED, payload=SPEED_PAYLOAD.pack(rpm, speed_data['timestamp']), qos=0, retain=True)
+        if result == mqtt_client.MQTT_ERR_SUCCESS: last_published_rpm = rpm; last_published_time = now
+        else: print(f"MQTT: Failed to publish speed (Error code: {result})")
+    except Exception as e: print(f"Error during MQTT speed publish: {e}")
 
 # --- Status Update Logic (Unchanged) ---
 def update_status_indicators():
-    global status_flags, last_status_update_time; now = time.time(); last_status_update_time = now
+    global status_flags, last_status_update_time; last_status_update_time = time.monotonic()
+    now = time.time() # Data ages are measured against wall-clock message/record timestamps
     status_flags["mqtt_ok"] = mqtt_connected
     gps_msg_age = now - gps_status_data.get('last_update_time', 0)
     status_flags["gps_fix_ok"] = gps_status_data.get('has_fix', False) and (gps_msg_age < STALE_DATA_THRESHOLD_S * 2.5)
@@ -268,7 +409,7 @@ def draw_status_bar(draw): # Centered (Unchanged)
     speed_char = "S" if status_flags["speed_data_ok"] else "s"; status_text = f"{mqtt_char}{gps_char}{speed_char}"
     bbox = status_bar_font.getbbox(status_text); text_width = bbox[2] - bbox[0]
     x_pos = (device.width - text_width) // 2
-    draw.text((x_pos, y_pos), status_text, font=status_bar_font, fill="white", spacing=spacing, anchor="lt")
+    paste_text((x_pos, y_pos), status_text, status_bar_font, "lt")
 
 def draw_lap_info_and_timers(draw): # Ideal time added (Unchanged)
     y_offset = 0; line_height = 12
@@ -277,19 +418,19 @@ def draw_lap_info_and_timers(draw): # Ideal time added (Unchanged)
         # Use the potentially updated total_laps, default to 0 if it's still -1 or None
         total = int(race_data.get('total_laps', 0) if race_data.get('total_laps', -1) != -1 else 0)
         lap_text = f"{current}/{total}"
-        draw.text((2, y_offset), lap_text, font=lap_info_font, fill="white", anchor="lt")
+        paste_text((2, y_offset), lap_text, lap_info_font, "lt")
         bbox = lap_info_font.getbbox(lap_text); y_offset += (bbox[3] - bbox[1]) + 4
 
         current_lap_elapsed = None
         if race_data.get('current_lap_start_time'): current_lap_elapsed = time.time() - race_data['current_lap_start_time']
         this_time_str = format_time(current_lap_elapsed)
-        draw.text((0, y_offset), f"THIS {this_time_str}", fill="white", font=time_info_font); y_offset += line_height
+        paste_text((0, y_offset), f"THIS {this_time_str}", time_info_font); y_offset += line_height
 
         last_time_str = format_time(race_data.get('last_lap_time_seconds'))
-        draw.text((0, y_offset), f"LAST {last_time_str}", fill="white", font=time_info_font); y_offset += line_height
+        paste_text((0, y_offset), f"LAST {last_time_str}", time_info_font); y_offset += line_height
 
         ideal_time_str = format_time(race_data.get('ideal_time'))
-        draw.text((0, y_offset), f"IDEAL {ideal_time_str}", fill="white", font=time_info_font)
+        paste_text((0, y_offset), f"IDEAL {ideal_time_str}", time_info_font)
     except Exception as e:
         print(f"Error drawing lap/time info: {e}")
         draw.text((2, 0), "?/?", font=lap_info_font, fill="white", anchor="lt")
@@ -299,32 +440,33 @@ def draw_lap_info_and_timers(draw): # Ideal time added (Unchanged)
 
 # --- Main Display Loop (Unchanged) ---
 print("Starting main display loop...")
-attempt_mqtt_connect()
+threading.Thread(target=reconnect_watchdog, name="mqtt-reconnect-watchdog", daemon=True).start()
+next_frame_time = time.monotonic()
 try:
     while True:
-        now = time.time()
+        now = time.monotonic()
         speed_data = read_speed_data(); current_speed_kmh = speed_data['speed_kmh']
+        publish_speed(speed_data)
         if (now - last_status_update_time) >= STATUS_UPDATE_INTERVAL_S: update_status_indicators()
-        try: image = Image.new('1', (device.width, device.height), 0); draw = ImageDraw.Draw(image)
-        except Exception as e: print(f"CRITICAL: Failed to create image buffer: {e}"); time.sleep(1); continue
+        try: image.paste(gauge_background) # In-place reset, no per-frame allocation
+        except Exception as e: print(f"CRITICAL: Failed to reset image buffer: {e}"); time.sleep(1); continue
         draw_status_bar(draw); draw_lap_info_and_timers(draw)
         try: # Tachometer drawing
             if max_speed > 0: speed_for_gauge = min(max(current_speed_kmh, 0), max_speed); needle_angle = start_angle - ((start_angle - end_angle) * (speed_for_gauge / max_speed))
             else: needle_angle = start_angle
-            draw_arc_outline(draw); draw_speed_ticks(draw); draw_needle(draw, needle_angle)
-            draw.text((device.width, device.height), f"{int(current_speed_kmh)}", fill="white", font=digital_font, anchor="rb")
+            draw_needle(draw, needle_angle) # Arc and ticks come from gauge_background
+            paste_text((device.width, device.height), speed_text(current_speed_kmh), digital_font, "rb")
         except Exception as e: print(f"Error drawing tachometer elements: {e}")
-        try: device.display(image)
+        try: push_frame(image)
         except Exception as e: print(f"Warning: Error updating OLED display: {e}")
-        attempt_mqtt_connect()
-        time.sleep(0.1)
+        # Fixed-rate pacing: render time counts against the frame period; if we overran, resync instead of bursting
+        next_frame_time += FRAME_INTERVAL_S; frame_delay = next_frame_time - time.monotonic()
+        if frame_delay <= 0: next_frame_time = time.monotonic(); frame_delay = 0.0
+        service_mqtt(frame_delay) # The frame gap is spent on MQTT I/O
 except KeyboardInterrupt: print("\nCtrl+C detected. Shutting down...")
 except Exception as e: print(f"CRITICAL: An unexpected error occurred in the main loop: {e}")
 finally: # Cleanup (Unchanged)
-    print("Stopping MQTT loop...");
-    if mqtt_loop_running:
-        try: client.loop_stop()
-        except Exception as e: print(f"Error stopping MQTT loop: {e}")
+    reconnect_stop.set()
     try: client.disconnect(); print("MQTT client disconnected.")
     except Exception as e: print(f"Error disconnecting MQTT client: {e}")
     try: device.clear(); device.hide()
@@ -1,15 +1,36 @@
 #!/usr/bin/env python3
+# cython: language_level=3
 
 import math
 import json
 import time
 from datetime import datetime, timezone # Added timezone
+from functools import reduce
+from operator import xor
 import paho.mqtt.client as mqtt
 import serial
 import pynmea2
 import threading
 import signal
 import sys
+try: # Optional: JIT-compiled crossing kernel (pip install numba)
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None; njit = None
+try: # numba cannot JIT functions of a Cython-compiled module (cythonize -i gps.py), so the crossing kernel stays plain there
+    import cython
+    if cython.compiled: np = None; njit = None
+except ImportError:
+    pass
+try: # Optional: faster JSON encoding of publish payloads (pip install orjson)
+    import orjson
+except ImportError:
+    orjson = None
+try: # Optional: lap state persistence across restarts (pip install redis)
+    import redis
+except ImportError:
+    redis = None
 # import os # Keep os import if needed elsewhere (currently not)
 
 # --- Constants ---
@@ -19,26 +40,49 @@ MQTT_BROKER = "tome.lu"
 MQTT_PORT = 1883
 MQTT_USERNAME = "eco"
 MQTT_PASSWORD = "marathon" # Consider environment variables or config file
-MQTT_CLIENT_ID = "gps_monitor_pi"
+MQTT_CLIENT_ID = "gps_monitor_pi" # Must stay stable for the persistent session
+MQTT_MAX_INFLIGHT = 20   # QoS 1 publishes allowed in flight before queueing
+MQTT_MAX_QUEUED = 1000   # Outgoing messages buffered while the in-flight window is full (publish_to_mqtt drops them while offline)
+MQTT_KEEPALIVE_S = 30
 
 # --- MQTT Topics ---
 MQTT_TOPIC_POSITION = "gps/position" # Lat, Lon, Speed(kmh), Heading, Alt, Timestamp
 MQTT_TOPIC_GPS_STATUS = "gps/status"   # Fix status, quality, satellites (Retained)
 MQTT_TOPIC_LAPS = "race/laps"          # Lap completion events (Not Retained)
+MQTT_TOPIC_TELEMETRY = "gps/telemetry" # Position + status fused when both are due (Not Retained)
 
 # --- Configuration Topics ---
 MQTT_TOPIC_CONFIG_START = "config/start_line"
 MQTT_TOPIC_CONFIG_FINISH = "config/finish_line"
 MQTT_TOPIC_CONFIG_LAP = "config/lap_line"
 MQTT_TOPIC_CONFIG_TOTAL_LAPS = "config/total_laps"
+MQTT_TOPIC_CONFIG_RESET = "config/reset" # Any payload clears lap progress (publish without retain)
 
 # --- Proximity Check Radius ---
 PROXIMITY_RADIUS_METERS = 25.0
 
+# --- Minimum Movement Between Fixes ---
+# Step below which crossing checks are skipped, compared squared in raw degrees.
+# One degree of latitude is ~111.32 km; a longitude degree is shorter (~0.64x at 50N), so the east-west cutoff there is only ~0.22 m.
+# Filters GPS jitter while parked so it cannot trigger false line crossings.
+MIN_STEP_METERS = 0.35
+MIN_STEP_SQ = (MIN_STEP_METERS / 111320.0) ** 2 # ~1e-11 deg^2
+
+# --- Lap State Persistence (Redis, optional) ---
+REDIS_SOCKET_PATH = '/var/run/redis/redis-server.sock'
+REDIS_STATE_KEY = 'gps:state'
+REDIS_STATE_TTL_S = 24 * 3600 # Forget a stale race after a day
+PERSISTED_RACE_FIELDS = ("start_line_p1", "start_line_p2", "finish_line_p1", "finish_line_p2", "lap_line_p1", "lap_line_p2",
+                         "total_laps", "current_lap", "current_lap_start_time", "race_finished")
+RACE_PROGRESS_FIELDS = ("current_lap", "current_lap_start_time", "race_finished") # Cleared by config/reset
+
 # --- Serial Error Handling ---
 serial_read_error_count = 0
 MAX_SERIAL_READ_ERRORS_BEFORE_RECONNECT = 10
 
+# --- Publish Intervals ---
+STATUS_PUBLISH_INTERVAL = 1.0 # Publish status at least every 1 second (heartbeat)
+
 # --- Speed Conversion ---
 KNOTS_TO_KMH = 1.852
 
@@ -54,8 +98,10 @@ gps_state = {
     "fix_quality": 0,
     "num_satellites": 0,
     "error_count": 0,
-    "last_valid_time": None,
+    "last_valid_time": None, # Epoch seconds of the last fix, from the NMEA time fields
     "previous_position": None, # Store as (lon, lat)
+    "crossing_anchor": None, # (lon, lat) crossings are measured from; only advances once a step passes MIN_STEP_SQ
+    "crossing_anchor_time": None, # Epoch seconds of crossing_anchor
 }
 
 race_state = {
@@ -75,39 +121,58 @@ race_state = {
 }
 
 mqtt_client = None
+redis_client = None
 serial_connection = None
 shutdown_flag = threading.Event()
-last_status_publish_time = 0 # Track time for periodic status updates
-
-# --- Geometric Helper Functions (Unchanged) ---
-def on_segment(p, q, r):
-    """Check if point q lies on segment pr. Points are (lon, lat)."""
-    if p is None or q is None or r is None: return False # Added None check
-    if not (min(p[0], r[0]) <= q[0] <= max(p[0], r[0]) and
-            min(p[1], r[1]) <= q[1] <= max(p[1], r[1])):
-        return False
-    val = (q[0] - p[0]) * (r[1] - p[1]) - (r[0] - p[0]) * (q[1] - p[1])
-    return abs(val) < 1e-9
-
-def orientation(p, q, r):
-    """Find orientation of ordered triplet (p, q, r). Points are (lon, lat)."""
-    if p is None or q is None or r is None: return 0 # Treat None as collinear/indeterminate
-    val = (q[0] - p[0]) * (r[1] - p[1]) - (r[0] - p[0]) * (q[1] - p[1])
-    if abs(val) < 1e-9: return 0
-    return 1 if val > 0 else -1
-
-def intersect(p1, q1, p2, q2):
-    """Check if line segment 'p1q1' intersects line segment 'p2q2'. Points are (lon, lat)."""
-    if p1 is None or q1 is None or p2 is None or q2 is None: return False
-    o1 = orientation(p1, q1, p2); o2 = orientation(p1, q1, q2)
-    o3 = orientation(p2, q2, p1); o4 = orientation(p2, q2, q1)
-    if o1 != 0 and o2 != 0 and o3 != 0 and o4 != 0:
-        if o1 != o2 and o3 != o4: return True
-    if o1 == 0 and on_segment(p1, p2, q1): return True
-    if o2 == 0 and on_segment(p1, q2, q1): return True
-    if o3 == 0 and on_segment(p2, p1, q2): return True
-    if o4 == 0 and on_segment(p2, q1, q2): return True
-    return False
+last_status_publish_time = 0 # time.monotonic() of the last status publish, for periodic status updates
+last_config_payloads = {} # Raw payload bytes of the last applied message per config topic
+restored_config_topics = set() # Config topics not yet received since lap progress was restored from Redis
+
+# Line geometry for segment_crossings, one row per entry in LINE_NAMES: start (lon, lat) and delta to the end point
+LINE_NAMES = ("start_line", "lap_line", "finish_line")
+LINE_START, LINE_LAP, LINE_FINISH = range(len(LINE_NAMES))
+if np is not None:
+    line_starts = np.zeros((len(LINE_NAMES), 2)); line_deltas = np.zeros((len(LINE_NAMES), 2))
+else:
+    line_starts = [[0.0, 0.0] for _ in LINE_NAMES]; line_deltas = [[0.0, 0.0] for _ in LINE_NAMES]
+
+# --- Geometric Helper Functions ---
+def line_crossing_fraction(prev_x, prev_y, curr_x, curr_y, line_x, line_y, line_dx, line_dy):
+    """Fraction (0..1) along prev->curr where it crosses segment line->line+d, or -1.0 if it does not. Points are (lon, lat)."""
+    # Side of the line for both fixes (s1, s2) and side of the path for both line ends (u1, u2)
+    s1 = line_dx * (prev_y - line_y) - line_dy * (prev_x - line_x)
+    s2 = line_dx * (curr_y - line_y) - line_dy * (curr_x - line_x)
+    if s1 == s2 or s1 * s2 > 0.0: return -1.0 # Same side, parallel, or zero-length (unset) line
+    move_dx = curr_x - prev_x; move_dy = curr_y - prev_y
+    u1 = move_dx * (line_y - prev_y) - move_dy * (line_x - prev_x)
+    u2 = move_dx * (line_y + line_dy - prev_y) - move_dy * (line_x + line_dx - prev_x)
+    if u1 * u2 > 0.0: return -1.0 # Path passes beside the segment
+    return s1 / (s1 - s2)
+
+if njit is not None:
+    line_crossing_fraction = njit(cache=True)(line_crossing_fraction)
+
+    @njit(cache=True)
+    def segment_crossings(prev, curr, line_starts, line_deltas):
+        """Crossing fraction of prev->curr for every configured line (-1.0 where not crossed)."""
+        out = np.empty(line_starts.shape[0])
+        for i in range(line_starts.shape[0]):
+            out[i] = line_crossing_fraction(prev[0], prev[1], curr[0], curr[1],
+                                            line_starts[i, 0], line_starts[i, 1], line_deltas[i, 0], line_deltas[i, 1])
+        return out
+else:
+    def segment_crossings(prev, curr, line_starts, line_deltas):
+        """Crossing fraction of prev->curr for every configured line (-1.0 where not crossed)."""
+        return [line_crossing_fraction(prev[0], prev[1], curr[0], curr[1], start[0], start[1], delta[0], delta[1])
+                for start, delta in zip(line_starts, line_deltas)]
+
+def update_line_arrays():
+    """Copies the configured lines from race_state into line_starts/line_deltas for segment_crossings."""
+    for i, name in enumerate(LINE_NAMES):
+        p1 = race_state[f"{name}_p1"]; p2 = race_state[f"{name}_p2"]
+        if p1 is None or p2 is None: p1 = p2 = (0.0, 0.0) # Zero-length line never crosses
+        line_starts[i][0] = p1[0]; line_starts[i][1] = p1[1]
+        line_deltas[i][0] = p2[0] - p1[0]; line_deltas[i][1] = p2[1] - p1[1]
 
 def calculate_midpoint(p1, p2):
     """Calculates the midpoint between two points (lon, lat)."""
@@ -122,14 +187,18 @@ def haversine_distance(p1, p2):
     a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
     return 6371000 * c
+
+def interpolate_crossing_time(fraction, prev_time, curr_time):
+    """Estimates the epoch time the line was crossed between two fixes (linear interpolation)."""
+    if prev_time is None or curr_time is None or curr_time < prev_time: return curr_time
+    return float(prev_time + fraction * (curr_time - prev_time)) # fraction is np.float64 from the numba kernel; orjson would stringify it
 # --- End Geometric Helpers ---
 
-# --- Simplified Crossing Logic with Proximity (Unchanged) ---
-def is_crossing_line_with_proximity(line_p1, line_p2, prev_pos, curr_pos, radius_meters):
-    """Checks intersection and proximity to line center."""
+# --- Simplified Crossing Logic with Proximity ---
+def is_crossing_line_with_proximity(line_p1, line_p2, prev_pos, curr_pos, radius_meters, fraction):
+    """Checks intersection (fraction from segment_crossings) and proximity to line center."""
+    if fraction < 0.0: return False
     if prev_pos is None or curr_pos is None or line_p1 is None or line_p2 is None: return False
-    if prev_pos == curr_pos: return False
-    if not intersect(line_p1, line_p2, prev_pos, curr_pos): return False
     line_center = calculate_midpoint(line_p1, line_p2)
     if line_center is None: return False
     dist_prev_to_center = haversine_distance(prev_pos, line_center)
@@ -144,7 +213,8 @@ def on_connect(client, userdata, flags, rc, properties=None):
         print("Successfully connected to MQTT Broker.")
         config_topics = [
             (MQTT_TOPIC_CONFIG_START, 2), (MQTT_TOPIC_CONFIG_FINISH, 2),
-            (MQTT_TOPIC_CONFIG_LAP, 2), (MQTT_TOPIC_CONFIG_TOTAL_LAPS, 2)
+            (MQTT_TOPIC_CONFIG_LAP, 2), (MQTT_TOPIC_CONFIG_TOTAL_LAPS, 2),
+            (MQTT_TOPIC_CONFIG_RESET, 2)
         ]
         client.subscribe(config_topics)
         print(f"Subscribed to config topics: {[t[0] for t in config_topics]}")
@@ -158,27 +228,53 @@ def on_disconnect(client, userdata, flags, reason_code=None, properties=None):
     if reason_code != 0:
          print("Unexpected disconnection. Client will attempt to reconnect automatically.")
 
+def reset_race_progress(reason):
+    """Clears the lap counter, lap start time, finished flag and crossing debounce; lines and total laps are kept."""
+    race_state["_last_line_crossed_type"] = None; race_state["_last_cross_time_epoch"] = None # Don't debounce the next real crossing
+    if race_state["current_lap"] == 0 and not race_state["race_finished"]: return
+    race_state["current_lap"] = 0; race_state["current_lap_start_time"] = None; race_state["race_finished"] = False
+    print(f"Race progress reset ({reason}).")
+
+def set_line(prefix, data):
+    """Stores a configured line; returns True if it differs from the current one."""
+    p1 = tuple(data['p1']); p2 = tuple(data['p2'])
+    changed = (race_state[prefix + "_p1"], race_state[prefix + "_p2"]) != (p1, p2)
+    race_state[prefix + "_p1"] = p1; race_state[prefix + "_p2"] = p2
+    return changed
+
 def on_message(client, userdata, msg):
     """Callback for received config messages."""
     global race_state
     topic = msg.topic
+    # Retained config is replayed on every reconnect; skip decoding if nothing changed
+    if msg.payload == last_config_payloads.get(topic) and topic != MQTT_TOPIC_CONFIG_RESET: return
     try:
         payload = msg.payload.decode('utf-8')
+        setup_changed = False # Only checked against a race restored from Redis; live corrections keep the lap progress
         if topic == MQTT_TOPIC_CONFIG_START:
-            data = json.loads(payload); race_state["start_line_p1"] = tuple(data['p1']); race_state["start_line_p2"] = tuple(data['p2'])
-            print(f"Updated Start Line: {race_state['start_line_p1']} -> {race_state['start_line_p2']}")
+            setup_changed = set_line("start_line", json.loads(payload))
+            update_line_arrays(); print(f"Updated Start Line: {race_state['start_line_p1']} -> {race_state['start_line_p2']}")
         elif topic == MQTT_TOPIC_CONFIG_FINISH:
-            data = json.loads(payload); race_state["finish_line_p1"] = tuple(data['p1']); race_state["finish_line_p2"] = tuple(data['p2'])
-            print(f"Updated Finish Line: {race_state['finish_line_p1']} -> {race_state['finish_line_p2']}")
+            setup_changed = set_line("finish_line", json.loads(payload))
+            update_line_arrays(); print(f"Updated Finish Line: {race_state['finish_line_p1']} -> {race_state['finish_line_p2']}")
         elif topic == MQTT_TOPIC_CONFIG_LAP:
-            data = json.loads(payload); race_state["lap_line_p1"] = tuple(data['p1']); race_state["lap_line_p2"] = tuple(data['p2'])
-            print(f"Updated Lap Line: {race_state['lap_line_p1']} -> {race_state['lap_line_p2']}")
+            setup_changed = set_line("lap_line", json.loads(payload))
+            update_line_arrays(); print(f"Updated Lap Line: {race_state['lap_line_p1']} -> {race_state['lap_line_p2']}")
         elif topic == MQTT_TOPIC_CONFIG_TOTAL_LAPS:
             try:
                 laps = int(payload)
-                if laps >= 0: race_state["total_laps"] = laps; print(f"Updated Total Laps: {race_state['total_laps']}")
+                if laps >= 0:
+                    setup_changed = laps != race_state["total_laps"]
+                    race_state["total_laps"] = laps; print(f"Updated Total Laps: {race_state['total_laps']}")
                 else: print(f"Warning: Received invalid total laps value: {payload}")
             except ValueError: print(f"Warning: Could not parse total laps value: {payload}")
+        elif topic == MQTT_TOPIC_CONFIG_RESET:
+            reset_race_progress("config/reset")
+        if setup_changed and topic in restored_config_topics:
+            reset_race_progress(f"{topic} differs from the restored race"); restored_config_topics.clear()
+        restored_config_topics.discard(topic)
+        last_config_payloads[topic] = msg.payload
+        save_race_state()
     except json.JSONDecodeError: print(f"Error decoding JSON from topic {topic}: {payload}")
     except KeyError as e: print(f"Error processing message from topic {topic}: Missing key {e}")
     except Exception as e: print(f"An unexpected error occurred in on_message for topic {topic}: {e}")
@@ -192,6 +288,48 @@ def get_utc_iso_timestamp():
     """Returns the current UTC time in ISO 8601 format with Z."""
     return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
 
+def epoch_to_utc_iso(epoch):
+    """Converts epoch seconds to UTC ISO 8601 format with Z."""
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+def nmea_checksum_valid(line):
+    """Validates the '*XX' checksum of a raw NMEA line (bytes) before any decoding."""
+    if not line.startswith(b'$') or b'*' not in line: return False
+    body, checksum = line[1:].rsplit(b'*', 1)
+    try: return int(checksum[:2], 16) == reduce(xor, body, 0)
+    except ValueError: return False
+
+def get_float_field(msg, attr, default=None):
+    """Returns NMEA field attr as float, or default if it is missing, empty or invalid."""
+    value = getattr(msg, attr, None)
+    if value is None or value == '': return default
+    try: return float(value)
+    except (TypeError, ValueError):
+        print(f"NMEA: Invalid {attr} value {value!r} in {msg.sentence_type}"); return default
+
+def get_int_field(msg, attr, default=0):
+    """Returns NMEA field attr as int, or default if it is missing, empty or invalid."""
+    value = getattr(msg, attr, None)
+    if value is None or value == '': return default
+    try: return int(value)
+    except (TypeError, ValueError):
+        print(f"NMEA: Invalid {attr} value {value!r} in {msg.sentence_type}"); return default
+
+def nmea_fix_epoch(msg):
+    """Epoch seconds of the fix in msg: RMC date + time, or GGA time of day on the UTC date closest to now.
+    Falls back to time.time() when the sentence carries no usable time."""
+    now = time.time()
+    try:
+        fix_time = getattr(msg, 'timestamp', None)
+        if not fix_time: return now
+        fix_date = getattr(msg, 'datestamp', None) # RMC only
+        if fix_date: return datetime.combine(fix_date, fix_time.replace(tzinfo=timezone.utc)).timestamp()
+        epoch = datetime.combine(datetime.now(timezone.utc).date(), fix_time.replace(tzinfo=timezone.utc)).timestamp()
+        if epoch - now > 43200: epoch -= 86400 # Fix from just before midnight UTC
+        elif now - epoch > 43200: epoch += 86400 # Fix from just after midnight UTC
+        return epoch
+    except (TypeError, ValueError, AttributeError): return now
+
 def update_from_nmea(nmea_sentence):
     """Parses NMEA sentence and updates gps_state. Returns True if state changed."""
     global gps_state
@@ -208,10 +346,10 @@ def update_from_nmea(nmea_sentence):
 
         # --- Process GGA ---
         if isinstance(msg, pynmea2.types.talker.GGA):
-            new_fix_quality = msg.gps_qual if msg.gps_qual is not None else 0
+            new_fix_quality = get_int_field(msg, 'gps_qual', 0)
             gps_state["fix_quality"] = new_fix_quality
-            gps_state["num_satellites"] = int(msg.num_sats) if msg.num_sats else 0
-            gps_state["altitude"] = msg.altitude if hasattr(msg, 'altitude') else gps_state["altitude"] # Keep last known if not present
+            gps_state["num_satellites"] = get_int_field(msg, 'num_sats', 0)
+            gps_state["altitude"] = get_float_field(msg, 'altitude', gps_state["altitude"]) # Keep last known if not present
 
             if new_fix_quality > 0 and msg.latitude is not None and msg.longitude is not None:
                 gps_state["latitude"] = msg.latitude
@@ -226,7 +364,7 @@ def update_from_nmea(nmea_sentence):
                          gps_state["timestamp"] = f"{today_date}T{time_str[:-3]}Z" # Milliseconds precision
                 elif gps_state["timestamp"] is None: # Absolute fallback
                      gps_state["timestamp"] = get_utc_iso_timestamp()
-                gps_state["last_valid_time"] = time.time()
+                gps_state["last_valid_time"] = nmea_fix_epoch(msg) # Receiver fix time, not serial arrival time
                 updated = True
             else:
                 gps_state["has_fix"] = False
@@ -237,8 +375,8 @@ def update_from_nmea(nmea_sentence):
              if msg.status == 'A' and msg.latitude is not None and msg.longitude is not None:
                  gps_state["latitude"] = msg.latitude
                  gps_state["longitude"] = msg.longitude
-                 gps_state["speed_knots"] = msg.spd_over_grnd if msg.spd_over_grnd is not None else 0.0
-                 gps_state["heading"] = msg.true_course if hasattr(msg, 'true_course') and msg.true_course is not None else gps_state["heading"] # Keep last known
+                 gps_state["speed_knots"] = get_float_field(msg, 'spd_over_grnd', 0.0)
+                 gps_state["heading"] = get_float_field(msg, 'true_course', gps_state["heading"]) # Keep last known
 
                  if hasattr(msg, 'datetime') and msg.datetime:
                      try:
@@ -250,7 +388,7 @@ def update_from_nmea(nmea_sentence):
                       gps_state["timestamp"] = get_utc_iso_timestamp()
 
                  gps_state["has_fix"] = True
-                 gps_state["last_valid_time"] = time.time()
+                 gps_state["last_valid_time"] = nmea_fix_epoch(msg) # Receiver fix time, not serial arrival time
                  if gps_state["fix_quality"] == 0: gps_state["fix_quality"] = 1 # Basic fix
                  updated = True
              elif msg.status == 'V':
@@ -284,75 +422,133 @@ def update_from_nmea(nmea_sentence):
 def update_lap_status():
     """Checks for line crossings and publishes lap events to MQTT."""
     global race_state, gps_state, mqtt_client
-    if race_state["race_finished"] or not gps_state["has_fix"]: return
-    if race_state["total_laps"] <= 0: return
-    current_pos = (gps_state["longitude"], gps_state["latitude"])
-    prev_pos = gps_state["previous_position"]
-    if current_pos is None or prev_pos is None: return
-
+    if race_state["race_finished"] or race_state["total_laps"] <= 0: gps_state["crossing_anchor"] = None; return
+    if not gps_state["has_fix"]: return
     now_epoch = time.time()
-    now_iso = get_utc_iso_timestamp()
+    current_pos = (gps_state["longitude"], gps_state["latitude"])
+    curr_time = gps_state["last_valid_time"] or now_epoch
+    prev_pos = gps_state["crossing_anchor"]
+    if prev_pos is None: gps_state["crossing_anchor"] = current_pos; gps_state["crossing_anchor_time"] = curr_time; return
+    dx = current_pos[0] - prev_pos[0]; dy = current_pos[1] - prev_pos[1]
+    # Standing still (GPS jitter): keep the anchor so a slow creep still adds up to a step that gets checked
+    if dx * dx + dy * dy < MIN_STEP_SQ: return
+    # Crossing times are interpolated between the anchor and the current fix rather than snapped to the current one
+    prev_time = gps_state["crossing_anchor_time"]
+    gps_state["crossing_anchor"] = current_pos; gps_state["crossing_anchor_time"] = curr_time
     crossed_line_type_this_update = None
     debounce_seconds = 2.0
+    # One kernel call checks all three lines; fractions also give the interpolated crossing times
+    crossings = segment_crossings(prev_pos, current_pos, line_starts, line_deltas)
 
     # --- Check Start Line ---
     if race_state["current_lap"] == 0 and race_state["start_line_p1"] and race_state["start_line_p2"]:
-        if is_crossing_line_with_proximity(race_state["start_line_p1"], race_state["start_line_p2"], prev_pos, current_pos, PROXIMITY_RADIUS_METERS):
+        if is_crossing_line_with_proximity(race_state["start_line_p1"], race_state["start_line_p2"], prev_pos, current_pos, PROXIMITY_RADIUS_METERS, crossings[LINE_START]):
             if race_state["_last_line_crossed_type"] != 'start' or (now_epoch - (race_state.get("_last_cross_time_epoch", 0) or 0)) > debounce_seconds:
-                print(f"--- Crossed START Line at {now_iso} ---")
-                race_state["current_lap"] = 1; race_state["current_lap_start_time"] = now_epoch
+                cross_epoch = interpolate_crossing_time(crossings[LINE_START], prev_time, curr_time)
+                cross_iso = epoch_to_utc_iso(cross_epoch)
+                print(f"--- Crossed START Line at {cross_iso} ---")
+                race_state["current_lap"] = 1; race_state["current_lap_start_time"] = cross_epoch
                 race_state["_last_line_crossed_type"] = 'start'; race_state["_last_cross_time_epoch"] = now_epoch
                 crossed_line_type_this_update = 'start'
-                lap_payload = {"event": "race_started", "start_time_iso": now_iso, "lap_number_starting": 1, "total_laps": race_state["total_laps"]}
+                lap_payload = {"event": "race_started", "start_time_iso": cross_iso, "lap_number_starting": 1, "total_laps": race_state["total_laps"]}
                 publish_to_mqtt(MQTT_TOPIC_LAPS, lap_payload, qos=1, retain=False)
 
     # --- Check Lap Line ---
     elif 0 < race_state["current_lap"] <= race_state["total_laps"] and race_state["lap_line_p1"] and race_state["lap_line_p2"]:
         is_finish_line_same_as_lap = (race_state["lap_line_p1"] == race_state["finish_line_p1"] and race_state["lap_line_p2"] == race_state["finish_line_p2"])
         should_check_lap = not (race_state["current_lap"] == race_state["total_laps"] and is_finish_line_same_as_lap)
-        if should_check_lap and is_crossing_line_with_proximity(race_state["lap_line_p1"], race_state["lap_line_p2"], prev_pos, current_pos, PROXIMITY_RADIUS_METERS):
+        if should_check_lap and is_crossing_line_with_proximity(race_state["lap_line_p1"], race_state["lap_line_p2"], prev_pos, current_pos, PROXIMITY_RADIUS_METERS, crossings[LINE_LAP]):
             if race_state["_last_line_crossed_type"] != 'lap' or (now_epoch - (race_state.get("_last_cross_time_epoch", 0) or 0)) > debounce_seconds:
                 lap_just_completed = race_state["current_lap"]
-                print(f"--- Crossed LAP Line at {now_iso} (Completed Lap {lap_just_completed}) ---")
+                cross_epoch = interpolate_crossing_time(crossings[LINE_LAP], prev_time, curr_time)
+                cross_iso = epoch_to_utc_iso(cross_epoch)
+                print(f"--- Crossed LAP Line at {cross_iso} (Completed Lap {lap_just_completed}) ---")
                 lap_duration = None; start_time_iso = None
                 if race_state["current_lap_start_time"] is not None:
-                    lap_duration = now_epoch - race_state["current_lap_start_time"]
-                    start_time_iso = datetime.fromtimestamp(race_state["current_lap_start_time"], timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+                    lap_duration = cross_epoch - race_state["current_lap_start_time"]
+                    start_time_iso = epoch_to_utc_iso(race_state["current_lap_start_time"])
                     print(f"    Lap {lap_just_completed} Time: {lap_duration:.2f}s")
-                lap_payload = {"event": "lap_completed", "lap_number": lap_just_completed, "start_time_iso": start_time_iso, "end_time_iso": now_iso, "duration_seconds": lap_duration, "total_laps": race_state["total_laps"]}
+                lap_payload = {"event": "lap_completed", "lap_number": lap_just_completed, "start_time_iso": start_time_iso, "end_time_iso": cross_iso, "duration_seconds": lap_duration, "total_laps": race_state["total_laps"]}
                 publish_to_mqtt(MQTT_TOPIC_LAPS, lap_payload, qos=1, retain=False)
-                race_state["current_lap"] += 1; race_state["current_lap_start_time"] = now_epoch
+                race_state["current_lap"] += 1; race_state["current_lap_start_time"] = cross_epoch
                 race_state["_last_line_crossed_type"] = 'lap'; race_state["_last_cross_time_epoch"] = now_epoch
                 crossed_line_type_this_update = 'lap'
                 if race_state["current_lap"] > race_state["total_laps"]:
                     print("--- RACE FINISHED (by completing last lap via Lap Line) ---")
                     race_state["race_finished"] = True
-                    finish_payload = {"event": "race_finished", "finish_time_iso": now_iso, "final_lap_number": lap_just_completed, "final_lap_duration_seconds": lap_duration}
+                    finish_payload = {"event": "race_finished", "finish_time_iso": cross_iso, "final_lap_number": lap_just_completed, "final_lap_duration_seconds": lap_duration}
                     publish_to_mqtt(MQTT_TOPIC_LAPS, finish_payload, qos=1, retain=False)
 
     # --- Check Finish Line ---
     if race_state["current_lap"] == race_state["total_laps"] and not race_state["race_finished"] and race_state["finish_line_p1"] and race_state["finish_line_p2"]:
         is_finish_line_same_as_lap = (race_state["lap_line_p1"] == race_state["finish_line_p1"] and race_state["lap_line_p2"] == race_state["finish_line_p2"])
         if crossed_line_type_this_update != 'lap' or is_finish_line_same_as_lap:
-            if is_crossing_line_with_proximity(race_state["finish_line_p1"], race_state["finish_line_p2"], prev_pos, current_pos, PROXIMITY_RADIUS_METERS):
+            if is_crossing_line_with_proximity(race_state["finish_line_p1"], race_state["finish_line_p2"], prev_pos, current_pos, PROXIMITY_RADIUS_METERS, crossings[LINE_FINISH]):
                 if race_state["_last_line_crossed_type"] != 'finish' or (now_epoch - (race_state.get("_last_cross_time_epoch", 0) or 0)) > debounce_seconds:
-                    print(f"--- Crossed FINISH Line at {now_iso} ---")
+                    cross_epoch = interpolate_crossing_time(crossings[LINE_FINISH], prev_time, curr_time)
+                    cross_iso = epoch_to_utc_iso(cross_epoch)
+                    print(f"--- Crossed FINISH Line at {cross_iso} ---")
                     lap_just_completed = race_state["current_lap"]
                     lap_duration = None; start_time_iso = None
                     if race_state["current_lap_start_time"] is not None:
-                         lap_duration = now_epoch - race_state["current_lap_start_time"]
-                         start_time_iso = datetime.fromtimestamp(race_state["current_lap_start_time"], timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+                         lap_duration = cross_epoch - race_state["current_lap_start_time"]
+                         start_time_iso = epoch_to_utc_iso(race_state["current_lap_start_time"])
                          print(f"    Final Lap ({lap_just_completed}) Time: {lap_duration:.2f}s")
                     race_state["race_finished"] = True
                     race_state["_last_line_crossed_type"] = 'finish'; race_state["_last_cross_time_epoch"] = now_epoch
                     crossed_line_type_this_update = 'finish'
-                    lap_payload = {"event": "lap_completed", "lap_number": lap_just_completed, "start_time_iso": start_time_iso, "end_time_iso": now_iso, "duration_seconds": lap_duration, "total_laps": race_state["total_laps"], "race_finished_flag": True}
+                    lap_payload = {"event": "lap_completed", "lap_number": lap_just_completed, "start_time_iso": start_time_iso, "end_time_iso": cross_iso, "duration_seconds": lap_duration, "total_laps": race_state["total_laps"], "race_finished_flag": True}
                     publish_to_mqtt(MQTT_TOPIC_LAPS, lap_payload, qos=1, retain=False)
-                    finish_payload = {"event": "race_finished", "finish_time_iso": now_iso, "final_lap_number": lap_just_completed, "final_lap_duration_seconds": lap_duration}
+                    finish_payload = {"event": "race_finished", "finish_time_iso": cross_iso, "final_lap_number": lap_just_completed, "final_lap_duration_seconds": lap_duration}
                     publish_to_mqtt(MQTT_TOPIC_LAPS, finish_payload, qos=1, retain=False)
+
+    if crossed_line_type_this_update is not None: save_race_state()
 # --- End Lap Timing ---
 
 
+# --- Lap State Persistence ---
+def setup_redis():
+    """Connects to the local Redis used to persist lap state. Returns True if available."""
+    global redis_client
+    if redis is None: print("redis module not installed, lap state will not survive restarts."); return False
+    try:
+        redis_client = redis.Redis(unix_socket_path=REDIS_SOCKET_PATH, socket_timeout=0.5, decode_responses=True)
+        redis_client.ping()
+        return True
+    except Exception as e:
+        print(f"Warning: Redis not available at {REDIS_SOCKET_PATH}: {e}")
+        redis_client = None; return False
+
+def save_race_state():
+    """Mirrors the persisted race_state fields (JSON encoded) to Redis with a TTL."""
+    if redis_client is None: return
+    try:
+        mapping = {field: json.dumps(race_state[field]) for field in PERSISTED_RACE_FIELDS}
+        pipe = redis_client.pipeline()
+        pipe.hset(REDIS_STATE_KEY, mapping=mapping); pipe.expire(REDIS_STATE_KEY, REDIS_STATE_TTL_S)
+        pipe.execute()
+    except Exception as e: print(f"Warning: Could not save lap state to Redis: {e}")
+
+def restore_race_state():
+    """Restores race_state from Redis (lines, lap counter, lap start time) before the main loop starts.
+    A finished race only restores its lines and lap count, so the next race starts from lap 0."""
+    if redis_client is None: return
+    try:
+        state = redis_client.hgetall(REDIS_STATE_KEY)
+        if not state: return
+        finished = json.loads(state.get("race_finished", "false"))
+        for field in PERSISTED_RACE_FIELDS:
+            if field not in state or (finished and field in RACE_PROGRESS_FIELDS): continue
+            value = json.loads(state[field])
+            race_state[field] = tuple(value) if field.endswith(("_p1", "_p2")) and value is not None else value
+        update_line_arrays()
+        # The first retained config after startup resets a resumed race if the lines or lap count were changed meanwhile
+        if race_state["current_lap"] > 0: restored_config_topics.update((MQTT_TOPIC_CONFIG_START, MQTT_TOPIC_CONFIG_FINISH, MQTT_TOPIC_CONFIG_LAP, MQTT_TOPIC_CONFIG_TOTAL_LAPS))
+        print(f"Restored lap state from Redis: lap {race_state['current_lap']}/{race_state['total_laps']}, finished={race_state['race_finished']}")
+    except Exception as e: print(f"Warning: Could not restore lap state from Redis: {e}")
+# --- End Lap State Persistence ---
+
+
 # --- Publishing Functions (Revised position data) ---
 
 def publish_to_mqtt(topic, payload_dict, qos=0, retain=False):
@@ -361,7 +557,8 @@ def publish_to_mqtt(topic, payload_dict, qos=0, retain=False):
     if mqtt_client and mqtt_client.is_connected():
         try:
             # Ensure all data is JSON serializable (esp. timestamps)
-            payload_json = json.dumps(payload_dict, default=str) # Use default=str as fallback
+            if orjson is not None: payload_json = orjson.dumps(payload_dict, default=str) # bytes, accepted by paho
+            else: payload_json = json.dumps(payload_dict, default=str) # Use default=str as fallback
             result = mqtt_client.publish(topic, payload_json, qos=qos, retain=retain)
             # print(f"Published to {topic}: {payload_json}") # Debug
         except TypeError as e:
@@ -369,38 +566,57 @@ def publish_to_mqtt(topic, payload_dict, qos=0, retain=False):
         except Exception as e:
             print(f"Error publishing to MQTT topic {topic}: {e}")
 
-def publish_position_data():
-    """Publishes core position data (speed in km/h) to MQTT_TOPIC_POSITION."""
+def build_position_payload():
+    """Builds the core position payload (speed in km/h). Returns None without a valid fix."""
     global gps_state
     # Only publish if we have a valid fix and essential data
-    if gps_state["has_fix"] and gps_state["latitude"] is not None and gps_state["longitude"] is not None:
-        # Convert speed to km/h for publishing
-        speed_kmh = None
-        if gps_state["speed_knots"] is not None:
-            speed_kmh = round(gps_state["speed_knots"] * KNOTS_TO_KMH, 2) # Round to 2 decimal places
-
-        payload = {
-            "latitude": gps_state["latitude"],
-            "longitude": gps_state["longitude"],
-            "altitude": gps_state["altitude"],
-            "speed_kmh": speed_kmh, # Publish speed in km/h
-            "heading": gps_state["heading"],
-            "timestamp": gps_state["timestamp"], # Already ISO format UTC
-        }
-        publish_to_mqtt(MQTT_TOPIC_POSITION, payload, qos=1, retain=False)
+    if not (gps_state["has_fix"] and gps_state["latitude"] is not None and gps_state["longitude"] is not None):
+        return None
+    # Convert speed to km/h for publishing
+    speed_kmh = None
+    if gps_state["speed_knots"] is not None:
+        speed_kmh = round(gps_state["speed_knots"] * KNOTS_TO_KMH, 2) # Round to 2 decimal places
+
+    return {
+        "latitude": gps_state["latitude"],
+        "longitude": gps_state["longitude"],
+        "altitude": gps_state["altitude"],
+        "speed_kmh": speed_kmh, # Publish speed in km/h
+        "heading": gps_state["heading"],
+        "timestamp": gps_state["timestamp"], # Already ISO format UTC
+    }
 
-def publish_gps_status():
-    """Publishes GPS fix status and quality to MQTT_TOPIC_GPS_STATUS."""
-    global gps_state, last_status_publish_time
-    payload = {
+def build_gps_status_payload():
+    """Builds the GPS fix status and quality payload."""
+    global gps_state
+    return {
         "has_fix": gps_state["has_fix"],
         "fix_quality": gps_state["fix_quality"],
         "num_satellites": gps_state["num_satellites"],
         "timestamp": get_utc_iso_timestamp() # Timestamp of the status update itself
     }
+
+def publish_position_data():
+    """Publishes core position data (speed in km/h) to MQTT_TOPIC_POSITION."""
+    payload = build_position_payload()
+    if payload is not None:
+        publish_to_mqtt(MQTT_TOPIC_POSITION, payload, qos=1, retain=False)
+
+def publish_gps_status():
+    """Publishes GPS fix status and quality to MQTT_TOPIC_GPS_STATUS."""
+    global last_status_publish_time
     # Publish status regardless of fix, retain the latest status
-    publish_to_mqtt(MQTT_TOPIC_GPS_STATUS, payload, qos=1, retain=True)
-    last_status_publish_time = time.time() # Record time of this publish
+    publish_to_mqtt(MQTT_TOPIC_GPS_STATUS, build_gps_status_payload(), qos=1, retain=True)
+    last_status_publish_time = time.monotonic() # Record time of this publish
+
+def publish_telemetry():
+    """Publishes position and status as one message to MQTT_TOPIC_TELEMETRY when the status heartbeat is due."""
+    global last_status_publish_time
+    position = build_position_payload()
+    if position is None: publish_gps_status(); return # Nothing to fuse without a fix
+    payload = {"position": position, "status": build_gps_status_payload()}
+    publish_to_mqtt(MQTT_TOPIC_TELEMETRY, payload, qos=1, retain=False)
+    last_status_publish_time = time.monotonic() # Counts as the status publish
 
 # --- End Publishing Functions ---
 
@@ -422,17 +638,25 @@ def read_from_serial():
                         if serial_read_error_count > 0: print("Serial communication resumed.")
                         serial_read_error_count = 0
                         try:
-                            nmea_sentence = line.decode('utf-8', errors='ignore').strip()
-                            if nmea_sentence.startswith('$'):
+                            # Drop noise and corrupted sentences on raw bytes, only decode valid ones
+                            nmea_line = line.strip()
+                            if nmea_checksum_valid(nmea_line):
+                                nmea_sentence = nmea_line.decode('ascii')
                                 # update_from_nmea returns True if status fields changed
-                                if update_from_nmea(nmea_sentence):
-                                    # Publish status immediately if it changed
-                                    publish_gps_status()
+                                status_changed = update_from_nmea(nmea_sentence)
+                                # Publish status immediately if it changed, or when the heartbeat is due
+                                heartbeat_due = (time.monotonic() - last_status_publish_time) >= STATUS_PUBLISH_INTERVAL
 
                                 # Publish position and check laps only if we have a fix
                                 if gps_state["has_fix"]:
-                                    publish_position_data()
+                                    # Changes go to the retained gps/status; only the heartbeat is fused with the position
+                                    if status_changed: publish_position_data(); publish_gps_status()
+                                    elif heartbeat_due: publish_telemetry()
+                                    else: publish_position_data()
                                     update_lap_status()
+                                elif status_changed or heartbeat_due:
+                                    publish_gps_status()
+                            elif nmea_line.startswith(b'$'): gps_state["error_count"] += 1 # Bad checksum
                             # else: Ignore non-NMEA lines
                         except UnicodeDecodeError: gps_state["error_count"] += 1
                         except Exception as e: print(f"Error processing serial line: {e}"); gps_state["error_count"] += 1
@@ -505,25 +729,28 @@ def setup_mqtt():
     global mqtt_client
     try:
         try: # V2 API
-            mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=MQTT_CLIENT_ID, clean_session=True)
+            mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=MQTT_CLIENT_ID, clean_session=False)
             print("Using paho-mqtt v2 API.")
             mqtt_client.on_disconnect = on_disconnect
             mqtt_client.on_publish = on_publish
         except AttributeError: # Fallback V1
             print("paho-mqtt v2 API not found, falling back to v1 compatible.")
-            mqtt_client = mqtt.Client(client_id=MQTT_CLIENT_ID, clean_session=True)
+            mqtt_client = mqtt.Client(client_id=MQTT_CLIENT_ID, clean_session=False)
             mqtt_client.on_disconnect = lambda c, u, rc: print(f"Disconnected (v1 API): rc={rc}")
             mqtt_client.on_publish = lambda c, u, mid: None # Suppress v1 logs
 
         mqtt_client.on_connect = on_connect
         mqtt_client.on_message = on_message
+        # Persistent session + wider in-flight window: QoS 1 lap/position publishes queue instead of stalling on broker RTT
+        mqtt_client.max_inflight_messages_set(MQTT_MAX_INFLIGHT)
+        mqtt_client.max_queued_messages_set(MQTT_MAX_QUEUED)
         if MQTT_USERNAME and MQTT_PASSWORD: mqtt_client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
 
         lwt_payload = json.dumps({"status": "offline", "reason": "unexpected disconnect", "timestamp": get_utc_iso_timestamp()})
         mqtt_client.will_set(MQTT_TOPIC_GPS_STATUS, payload=lwt_payload, qos=1, retain=True)
 
         print(f"Attempting to connect to MQTT broker {MQTT_BROKER}:{MQTT_PORT}...")
-        mqtt_client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
+        mqtt_client.connect_async(MQTT_BROKER, MQTT_PORT, MQTT_KEEPALIVE_S)
         mqtt_client.loop_start()
         return True
     except Exception as e: print(f"Error setting up MQTT: {e}"); return False
@@ -542,22 +769,27 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    if njit is not None:
+        print("Compiling line crossing kernel (numba)...")
+        segment_crossings((0.0, 0.0), (1.0, 1.0), line_starts, line_deltas) # Warm-up: JIT compile / load cache before fixes arrive
+
+    if setup_redis(): restore_race_state()
+
     if not open_serial(): print("Warning: Failed to open serial port on startup. Will retry.")
     if not setup_mqtt(): print("Critical: Failed to setup MQTT on startup. Exiting."); close_serial(); return 1
 
     serial_thread = threading.Thread(target=read_from_serial, name="SerialReader", daemon=True)
     serial_thread.start()
 
-    status_publish_interval = 1.0 # Publish status at least every 1 second
-
     try:
+        next_check_time = time.monotonic()
         while not shutdown_flag.is_set():
-            now = time.time()
+            now = time.monotonic()
 
             # --- Periodic GPS Status Publish ---
             # Publish status if enough time has passed since the last publish,
             # regardless of NMEA updates. Acts as a heartbeat.
-            if (now - last_status_publish_time) >= status_publish_interval:
+            if (now - last_status_publish_time) >= STATUS_PUBLISH_INTERVAL:
                 # print(f"Debug: Periodic status publish check ({(now - last_status_publish_time):.1f}s elapsed)") # Debug
                 publish_gps_status() # This also updates last_status_publish_time
 
@@ -573,10 +805,13 @@ def main():
                      print("Error: Could not reopen serial port for thread restart. Shutting down.")
                      shutdown_flag.set() # Trigger shutdown if restart fails
 
-            # Sleep for a short duration before next check cycle
-            # Adjust sleep time based on desired responsiveness vs CPU usage
-            # Sleep duration should be less than status_publish_interval
-            time.sleep(0.5) # Check status/health twice per second
+            # Sleep until the next check cycle (monotonic deadline, so work done above doesn't stretch the period)
+            # Adjust interval based on desired responsiveness vs CPU usage
+            # Interval should be less than STATUS_PUBLISH_INTERVAL
+            next_check_time += 0.5 # Check status/health twice per second
+            check_delay = next_check_time - time.monotonic()
+            if check_delay > 0: time.sleep(check_delay)
+            else: next_check_time = time.monotonic() # Overran: resync instead of bursting
 
     except Exception as e:
         print(f"Unexpected error in main loop: {e}")
@@ -1,19 +1,22 @@
 use rppal::gpio::{Gpio, Trigger};
-use std::time::{Instant, Duration};
+use std::time::{Instant, Duration, SystemTime, UNIX_EPOCH};
 use std::error::Error;
 use serde_json::json;
 use std::sync::atomic::{Ordering, AtomicBool};
 use std::sync::{Arc, mpsc};
 use signal_hook::{consts::SIGINT, iterator::Signals};
 use std::process::Command;
-use std::fs::OpenOptions;
+use std::fs::{File, OpenOptions};
 use std::io::Write;
+use std::os::unix::fs::FileExt;
 use std::collections::VecDeque;
 
 const GPIO_PIN: u8 = 26;
 const TIMEOUT_SECS: u64 = 2;
 const DEBOUNCE_MS: u64 = 20;
 const STATUS_FILE: &str = "/tmp/wheel_speed.json";
+const SHM_FILE: &str = "/dev/shm/wheel_speed";  // Fixed 16-byte record for local readers: f64 rpm, f64 unix time (little-endian)
+const SHM_RECORD_SIZE: u64 = 16;
 const RPM_BUFFER_SIZE: usize = 3;  // Average over last 3 readings for smoother output
 
 // Helper function for non-blocking file write
@@ -31,6 +34,26 @@ fn write_status_nonblocking(status: serde_json::Value) -> Result<(), Box<dyn Err
     Ok(())
 }
 
+// Shared-memory record: opened once, then overwritten in place so readers can keep it mmapped
+fn open_shm_record() -> Result<File, Box<dyn Error>> {
+    let file = OpenOptions::new()
+        .read(true)
+        .write(true)
+        .create(true)
+        .open(SHM_FILE)?;
+    file.set_len(SHM_RECORD_SIZE)?;
+    Ok(file)
+}
+
+fn write_shm_record(file: &File, rpm: f64) -> Result<(), Box<dyn Error>> {
+    let unix_time = SystemTime::now().duration_since(UNIX_EPOCH)?.as_secs_f64();
+    let mut record = [0u8; SHM_RECORD_SIZE as usize];
+    record[..8].copy_from_slice(&rpm.to_le_bytes());
+    record[8..].copy_from_slice(&unix_time.to_le_bytes());
+    file.write_all_at(&record, 0)?;  // Single pwrite at offset 0, no truncate
+    Ok(())
+}
+
 fn cleanup_gpio(pin: u8) {
     Command::new("sh")
         .arg("-c")
@@ -55,11 +78,26 @@ fn main() -> Result<(), Box<dyn Error>> {
     };
     
     // Create channel for file writing
-    let (tx, rx) = mpsc::channel();
+    let (tx, rx) = mpsc::channel::<serde_json::Value>();
     
+    // The JSON status file still works without /dev/shm, so a failure here only disables the shared-memory record
+    let shm_file = match open_shm_record() {
+        Ok(file) => Some(file),
+        Err(e) => {
+            eprintln!("Failed to open shared-memory record {}: {} (continuing without it)", SHM_FILE, e);
+            None
+        }
+    };
+
     // Spawn file writer thread
     std::thread::spawn(move || {
         while let Ok(status) = rx.recv() {
+            if let Some(file) = &shm_file {
+                let rpm = status["rpm"].as_f64().unwrap_or(0.0);
+                if let Err(e) = write_shm_record(file, rpm) {
+                    eprintln!("Failed to write shared-memory record: {}", e);
+                }
+            }
             if let Err(e) = write_status_nonblocking(status) {
                 eprintln!("Failed to write status: {}", e);
             }
@@ -123,11 +161,14 @@ fn main() -> Result<(), Box<dyn Error>> {
             }))?;
             
             last_time = now;
-        } else if current_rpm != 0.0 {
-            current_rpm = 0.0;
-            rpm_buffer.clear();  // Clear the buffer when stopping
-            println!("Speed: 0.0 RPM (no rotation for {} seconds)", TIMEOUT_SECS);
+        } else {
+            if current_rpm != 0.0 {
+                current_rpm = 0.0;
+                rpm_buffer.clear();  // Clear the buffer when stopping
+                println!("Speed: 0.0 RPM (no rotation for {} seconds)", TIMEOUT_SECS);
+            }
             
+            // Sent on every timeout tick, not just the transition, so the record's timestamp stays fresh while stopped
             tx.send(json!({
                 "rpm": 0.0,
                 "count": counter,